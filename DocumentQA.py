@@ -6,51 +6,95 @@ about them using local LLM models via Ollama.
 Usage: python DocumentQA.py [folder_path]
   If folder_path is not provided, defaults to "./documents"
 
-Requires: requests, PyPDF2, python-docx, scikit-learn
-Install: pip install requests PyPDF2 python-docx scikit-learn
+Requires: requests, pypdf (or PyPDF2), python-docx, scikit-learn
+Install: pip install requests pypdf python-docx scikit-learn
+Optional: pip install pypdfium2 (much faster PDF text extraction)
 
 """
 
+import mmap
 import os
+import re
+import sqlite3
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import json
+from collections import deque
 import requests
 
+# Extracted text is cached here, keyed by path + mtime + size
+EXTRACTION_CACHE_PATH = Path.home() / ".cache" / "folderqa" / "extracted.sqlite3"
+
 try:
-    from PyPDF2 import PdfReader
+    try:
+        # pypdf is the maintained successor of PyPDF2, with much faster text extraction
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
     from docx import Document as DocxDocument
     from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
     import numpy as np
 except ImportError as e:
     print(f"Import error: {e}")
     print("Please install required packages:")
-    print("  pip install requests PyPDF2 python-docx scikit-learn")
+    print("  pip install requests pypdf python-docx scikit-learn")
     sys.exit(1)
 
+try:
+    # Optional: C-backed PDF text extraction, much faster than pypdf/PyPDF2
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
 
 def extract_text_from_pdf(file_path):
-    """Extract text from a PDF file."""
+    """Extract text from a PDF file (pypdfium2 if installed, else pypdf/PyPDF2)."""
     try:
-        text = []
-        with open(file_path, 'rb') as f:
-            reader = PdfReader(f)
-            for page_num, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                if page_text:
-                    text.append(f"--- Page {page_num + 1} ---\n{page_text}")
-        return "\n".join(text)
+        if pdfium is not None:
+            return _extract_text_from_pdf_pdfium(file_path)
+        
+        # Let PdfReader open the file itself rather than wrapping our own handle
+        reader = PdfReader(str(file_path))
+        pages = reader.pages
+        parts = [None] * len(pages)
+        for page_num in range(len(pages)):
+            page_text = pages[page_num].extract_text()
+            parts[page_num] = f"--- Page {page_num + 1} ---\n{page_text}" if page_text else ""
+        return "\n".join(part for part in parts if part)
     except Exception as e:
         print(f"Error extracting PDF {file_path}: {e}")
         return ""
 
 
+def _extract_text_from_pdf_pdfium(file_path):
+    """Extract text from a PDF file with pypdfium2, same page format as the pypdf path."""
+    pdf = pdfium.PdfDocument(str(file_path))
+    try:
+        parts = [None] * len(pdf)
+        for page_num in range(len(pdf)):
+            page = pdf[page_num]
+            textpage = page.get_textpage()
+            page_text = textpage.get_text_range().replace("\r\n", "\n")
+            textpage.close()
+            page.close()
+            parts[page_num] = f"--- Page {page_num + 1} ---\n{page_text}" if page_text.strip() else ""
+        return "\n".join(part for part in parts if part)
+    finally:
+        pdf.close()
+
+
 def extract_text_from_docx(file_path):
     """Extract text from a DOCX file."""
     try:
         doc = DocxDocument(file_path)
-        paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+        # para.text rebuilds the string from the XML runs on every access, so read it once
+        paragraphs = []
+        for para in doc.paragraphs:
+            text = para.text
+            if text and not text.isspace():
+                paragraphs.append(text)
         return "\n".join(paragraphs)
     except Exception as e:
         print(f"Error extracting DOCX {file_path}: {e}")
@@ -60,16 +104,72 @@ def extract_text_from_docx(file_path):
 def extract_text_from_txt(file_path):
     """Extract text from a TXT file."""
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""  # mmap cannot map an empty file
+            # Decode straight from the memory-mapped file; the OS pages bytes in
+            # on demand instead of buffering the whole file through read()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return str(mm, 'utf-8', 'ignore')
     except Exception as e:
         print(f"Error reading TXT {file_path}: {e}")
         return ""
 
 
+def extract_text(file_path):
+    """Extract text from a supported file, dispatching on its extension."""
+    ext = Path(file_path).suffix.lower()
+    if ext == '.pdf':
+        return extract_text_from_pdf(file_path)
+    elif ext == '.docx':
+        return extract_text_from_docx(file_path)
+    elif ext == '.txt':
+        return extract_text_from_txt(file_path)
+    return ""
+
+
+def find_document_files(folder, extensions=('.pdf', '.txt', '.docx')):
+    """
+    Recursively yield paths (as strings) of files with a supported extension.
+    Names are filtered by extension before is_file() so unrelated files
+    (images, binaries) cost no stat call. Unreadable folders are skipped.
+    """
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from find_document_files(entry.path, extensions)
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    yield entry.path
+    except OSError as e:
+        print(f"Skipping {folder}: {e}")
+
+
+def _open_extraction_cache():
+    """Open (creating if needed) the extracted-text cache. Returns None if unavailable."""
+    try:
+        EXTRACTION_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(EXTRACTION_CACHE_PATH)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS extracted (key TEXT PRIMARY KEY, path TEXT, text TEXT)"
+        )
+        return conn
+    except sqlite3.Error as e:
+        print(f"Warning: extraction cache unavailable: {e}")
+        return None
+
+
+def _extraction_cache_key(file_path):
+    """Cache key that changes whenever the file is modified."""
+    st = file_path.stat()
+    return f"{file_path.resolve()}:{st.st_mtime_ns}:{st.st_size}"
+
+
 def load_documents_from_folder(folder_path):
     """
     Recursively scan folder for documents and extract text.
+    Unchanged files are read from the extraction cache; the rest are
+    extracted in parallel across CPU cores (PDF parsing is CPU-bound).
     Returns a dict: {file_path: extracted_text}
     """
     documents = {}
@@ -82,49 +182,294 @@ def load_documents_from_folder(folder_path):
     
     print(f"Scanning folder: {folder_path}")
     
-    for file_path in folder_path.rglob('*'):
-        if file_path.is_file():
-            ext = file_path.suffix.lower()
-            if ext not in supported_extensions:
-                continue
-            
-            print(f"  Loading {file_path.name}...", end=" ", flush=True)
-            text = None
-            
-            if ext == '.pdf':
-                text = extract_text_from_pdf(file_path)
-            elif ext == '.docx':
-                text = extract_text_from_docx(file_path)
-            elif ext == '.txt':
-                text = extract_text_from_txt(file_path)
-            
-            if text:
-                documents[str(file_path)] = text
-                print(f"✓ ({len(text)} chars)")
-            else:
-                print("(empty or failed)")
+    file_paths = [Path(path) for path in find_document_files(folder_path, tuple(supported_extensions))]
+    
+    cache = _open_extraction_cache()
+    keys = {}
+    for file_path in file_paths:
+        try:
+            keys[file_path] = _extraction_cache_key(file_path)
+        except OSError as e:
+            # e.g. removed or made unreadable since the scan: skip just this file
+            print(f"Error reading {file_path}: {e}")
+    file_paths = [file_path for file_path in file_paths if file_path in keys]
+    
+    texts = {}
+    if cache is not None:
+        for file_path in file_paths:
+            row = cache.execute("SELECT text FROM extracted WHERE key = ?", (keys[file_path],)).fetchone()
+            if row is not None:
+                texts[file_path] = row[0]
+        if texts:
+            print(f"  {len(texts)} unchanged file(s) loaded from cache")
+    
+    to_extract = [file_path for file_path in file_paths if file_path not in texts]
+    if len(to_extract) > 1:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = {executor.submit(extract_text, file_path): file_path for file_path in to_extract}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    texts[file_path] = future.result()
+                except Exception as e:
+                    print(f"Error extracting {file_path}: {e}")
+                    texts[file_path] = ""
+                _print_load_status(file_path, texts[file_path])
+    else:
+        for file_path in to_extract:
+            texts[file_path] = extract_text(file_path)
+            _print_load_status(file_path, texts[file_path])
+    
+    if cache is not None:
+        try:
+            with cache:
+                # Drop entries for files in this folder that were changed or removed
+                current_keys = set(keys.values())
+                folder_prefix = str(folder_path.resolve()) + os.sep
+                stale = [
+                    (key,) for key, path in cache.execute("SELECT key, path FROM extracted")
+                    if path.startswith(folder_prefix) and key not in current_keys
+                ]
+                cache.executemany("DELETE FROM extracted WHERE key = ?", stale)
+                # Empty results are not cached: a failed extraction (e.g. a
+                # permission error) would otherwise stick until the file changes
+                cache.executemany(
+                    "INSERT OR REPLACE INTO extracted (key, path, text) VALUES (?, ?, ?)",
+                    [(keys[file_path], str(file_path.resolve()), texts[file_path])
+                     for file_path in to_extract if texts[file_path]]
+                )
+        except sqlite3.Error as e:
+            print(f"Warning: could not update extraction cache: {e}")
+        finally:
+            cache.close()
+    
+    # Keep scan order so the index is the same from run to run
+    for file_path in file_paths:
+        if texts.get(file_path):
+            documents[str(file_path)] = texts[file_path]
     
     print(f"\nLoaded {len(documents)} document(s).\n")
     return documents
 
 
-def build_system_prompt(documents):
+def _print_load_status(file_path, text):
+    """Print the per-file result line shown while loading."""
+    if text:
+        print(f"  Loaded {file_path.name} ✓ ({len(text)} chars)")
+    else:
+        print(f"  Loaded {file_path.name} (empty or failed)")
+
+
+def split_text(text, chunk_size=1250, overlap=200):
     """
-    Build a system prompt that includes all document text.
-    This provides context to Gemini for answering questions.
+    Split text into chunks of at most chunk_size characters, preferring to break
+    at paragraph, line, sentence, then word boundaries rather than mid-word.
+    Consecutive chunks share up to `overlap` characters for continuity.
     """
-    if not documents:
-        return "You are a helpful assistant."
+    chunks = []
+    start = 0
+    text_len = len(text)
+    
+    while start < text_len:
+        end = min(start + chunk_size, text_len)
+        if end < text_len:
+            # Look for the latest natural break in the second half of the window
+            for separator in ("\n\n", "\n", ". ", " "):
+                cut = text.rfind(separator, start + chunk_size // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        
+        if end >= text_len:
+            break
+        start = max(end - overlap, start + 1)
+    
+    return chunks
+
+
+def _sentence_bounds(text):
+    """Sentence start offsets (plus len(text)): after ., ! or ? and whitespace, or a blank line."""
+    bounds = [0] + [m.end() for m in re.finditer(r'(?<=[.!?])\s+|\n\s*\n', text)]
+    if bounds[-1] < len(text):
+        bounds.append(len(text))
+    return bounds
+
+
+def _sentence_windows(text, bounds):
+    """Each sentence joined with one neighbour either side, to smooth out very short sentences."""
+    sentences = [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+    return [" ".join(sentences[max(0, i - 1):i + 2]) for i in range(len(sentences))]
+
+
+def semantic_chunk(text, breakpoint_percentile=95, max_chunk_size=2000, min_chunk_size=200,
+                   window_vectors=None):
+    """
+    Split text where the topic shifts instead of at fixed offsets.
+    Each sentence is embedded (together with its neighbours) as a TF-IDF vector;
+    a chunk boundary is placed wherever the cosine distance between adjacent
+    sentences is above the breakpoint_percentile of all distances in the text.
+    Chunks longer than max_chunk_size (~500 tokens) are split further; breaks
+    that would leave a chunk shorter than min_chunk_size are skipped.
+    window_vectors may hold this text's sentence-window vectors from a batch
+    fit over many documents (see build_rag_index); otherwise they are computed here.
+    """
+    bounds = _sentence_bounds(text)
+    if len(bounds) - 1 < 3:
+        return split_text(text, max_chunk_size)
+    
+    vectors = window_vectors
+    if vectors is None:
+        try:
+            vectors = TfidfVectorizer(dtype=np.float32).fit_transform(_sentence_windows(text, bounds))
+        except ValueError:  # No usable vocabulary (e.g. numbers/punctuation only)
+            return split_text(text, max_chunk_size)
+    
+    # Rows are L2-normalized, so the row-wise dot product is the cosine similarity
+    similarities = np.asarray(vectors[:-1].multiply(vectors[1:]).sum(axis=1)).ravel()
+    distances = 1.0 - similarities
+    threshold = np.percentile(distances, breakpoint_percentile)
+    
+    chunks = []
+    start = 0
+    for i in np.flatnonzero(distances > threshold):
+        if bounds[i + 1] - bounds[start] < min_chunk_size:
+            continue
+        chunks.extend(split_text(text[bounds[start]:bounds[i + 1]], max_chunk_size))
+        start = i + 1
+    chunks.extend(split_text(text[bounds[start]:], max_chunk_size))
+    return chunks
+
+
+def build_rag_index(documents, max_chunk_size=2000, child_chunk_size=400):
+    """
+    Build a small-to-big TF-IDF index over all documents.
+    Each document is semantically chunked into parent chunks (what the LLM
+    sees); each parent is split again into small child chunks (what is
+    searched), so matching is precise but the answer still gets full context.
+    Returns a dict with:
+      'chunks':          parent chunks [(chunk_text, {'file': path, 'chunk_id': n}), ...]
+      'child_to_parent': parent index for each child row of 'matrix'
+      'vectorizer':      fitted TfidfVectorizer (or None)
+      'matrix':          TF-IDF matrix (CSC), one row per child chunk (or None)
+    """
+    # Vectorize the sentence windows of every document in a single batch
+    # rather than fitting one vectorizer per document. The windows are fed
+    # from a generator, one document at a time, so only one document's
+    # window strings (~3x its text) are alive at once.
+    window_ranges = {}
+    
+    def iter_windows():
+        count = 0
+        for path, text in documents.items():
+            windows = _sentence_windows(text, _sentence_bounds(text))
+            window_ranges[path] = (count, count + len(windows))
+            count += len(windows)
+            yield from windows
+    
+    try:
+        all_window_vectors = TfidfVectorizer(dtype=np.float32).fit_transform(iter_windows())
+    except ValueError:  # No usable vocabulary anywhere (or no text at all)
+        all_window_vectors = None
+    
+    chunks = []
+    child_texts = []
+    child_to_parent = []
+    for path, text in documents.items():
+        window_vectors = None
+        if all_window_vectors is not None:
+            start, end = window_ranges[path]
+            window_vectors = all_window_vectors[start:end]
+        
+        doc_chunks = semantic_chunk(text, max_chunk_size=max_chunk_size, window_vectors=window_vectors)
+        for chunk_id, chunk in enumerate(doc_chunks):
+            parent_id = len(chunks)
+            chunks.append((chunk, {'file': path, 'chunk_id': chunk_id}))
+            for child in split_text(chunk, child_chunk_size, overlap=50):
+                child_texts.append(child)
+                child_to_parent.append(parent_id)
     
-    doc_content = "\n\n---\n\n".join([
-        f"Document: {path}\n\n{text[:5000]}"  # Increased from 3000 to provide more context
-        for path, text in documents.items()
-    ])
+    index = {'chunks': chunks, 'child_to_parent': child_to_parent, 'vectorizer': None, 'matrix': None}
+    if not child_texts:
+        return index
     
-    system_prompt = f"""You are an expert analyst providing detailed, well-researched answers based ONLY on the provided documents.
+    try:
+        # Pruning one-off and near-universal terms only makes sense once there
+        # are enough chunks; on tiny folders it would empty the vocabulary
+        prune = len(child_texts) >= 50
+        vectorizer = TfidfVectorizer(
+            max_features=10000,
+            stop_words='english',
+            ngram_range=(1, 2),  # Include bigrams for better phrase matching
+            min_df=2 if prune else 1,
+            max_df=0.95 if prune else 1.0,
+            sublinear_tf=True,
+            dtype=np.float32  # Half the memory of the float64 default, same ranking
+        )
+        # Column-major, so scoring a query only touches the columns of its own terms
+        index['matrix'] = vectorizer.fit_transform(child_texts).tocsc()
+        index['vectorizer'] = vectorizer
+    except Exception as e:
+        print(f"Error building TF-IDF index: {e}")
+    
+    return index
 
-DOCUMENTS:
-{doc_content}
+
+def retrieve_relevant_chunks(index, query, top_k=5):
+    """
+    Retrieve the parent chunks of the best matching child chunks for a query
+    using TF-IDF similarity. Each parent is returned at most once.
+    Returns: [(chunk_text, metadata), ...]
+    """
+    if index['vectorizer'] is None:
+        return []
+    
+    try:
+        # TfidfVectorizer L2-normalizes rows, so cosine similarity is a plain
+        # dot product; only the query's own term columns contribute
+        query_vec = index['vectorizer'].transform([query])
+        similarities = index['matrix'][:, query_vec.indices] @ query_vec.data
+        
+        min_similarity = 0.01  # Only include chunks with meaningful similarity
+        candidates = np.flatnonzero(similarities > min_similarity)
+        
+        # Rank a few children per wanted parent first; rank the rest only if
+        # those did not contain top_k distinct parents
+        first_pass = top_k * 4
+        if len(candidates) > first_pass:
+            part = np.argpartition(-similarities[candidates], first_pass)
+            batches = [candidates[part[:first_pass]], candidates[part[first_pass:]]]
+        else:
+            batches = [candidates]
+        
+        # Walk child hits best-first until top_k distinct parents are found
+        results = []
+        seen_parents = set()
+        for batch in batches:
+            for idx in batch[np.argsort(-similarities[batch])]:
+                parent_id = index['child_to_parent'][idx]
+                if parent_id not in seen_parents:
+                    seen_parents.add(parent_id)
+                    results.append(index['chunks'][parent_id])
+                    if len(results) >= top_k:
+                        return results
+        
+        return results
+    except Exception as e:
+        print(f"Error retrieving chunks: {e}")
+        return []
+
+
+def build_system_prompt():
+    """
+    Build the static system prompt (answering instructions only).
+    Retrieved document excerpts go in the user message, so this text never
+    changes between questions and Ollama can keep it cached.
+    """
+    return """You are an expert analyst providing detailed, well-researched answers based ONLY on the document excerpts provided with each question.
 
 CRITICAL INSTRUCTIONS:
 1. Answer must be comprehensive and detailed - provide full explanations, not brief summaries
@@ -141,21 +486,115 @@ CRITICAL INSTRUCTIONS:
 12. End with a brief summary if the answer is lengthy
 
 ANSWER QUALITY REQUIREMENT: Provide 3-5 substantial paragraphs for most questions, more if needed."""
+
+
+def build_question_prompt(question, relevant_chunks):
+    """
+    Build the per-question user message from the retrieved chunks.
+    Excerpts come before the question, so everything that varies per question
+    stays at the end of the prompt. The pieces are collected in a list and
+    joined once, so no intermediate context string is built.
+    """
+    parts = ["DOCUMENT EXCERPTS:\n"]
+    for i, (chunk, meta) in enumerate(relevant_chunks):
+        if i:
+            parts.append("\n\n---\n\n")
+        parts.extend((f"[From: {Path(meta['file']).name}]\n", chunk))
+    parts.extend(("\n\nUser Question: ", question))
+    return "".join(parts)
+
+
+def build_chat_messages(system_prompt, history, question_prompt):
+    """
+    Assemble the /api/chat messages for one question.
+    Static content first, dynamic content last: the system prompt never
+    changes, so Ollama always reuses its KV cache for it; the history and the
+    new user message (excerpts + question) follow. The history holds only the
+    bare questions and answers, not the excerpts they were answered from, so
+    re-evaluating it once the oldest pair is dropped stays cheap.
+    """
+    return [{"role": "system", "content": system_prompt}, *history, {"role": "user", "content": question_prompt}]
+
+
+def estimate_num_ctx(prompt_chars):
+    """
+    Pick a context window large enough for prompt_chars of prompt plus an
+    answer (~3 chars per token, rounded up to a multiple of 2048) so Ollama
+    never truncates - and therefore never re-evaluates - the prompt prefix.
+    """
+    needed = prompt_chars // 3 + 2048
+    return max(4096, -(-needed // 2048) * 2048)
+
+
+def warm_prompt_cache(ollama_url, ollama_model, system_prompt, options, keep_alive="30m", session=None):
+    """
+    Evaluate the system prompt once, right after loading, so the model is
+    resident and the prompt sits in Ollama's KV cache before the first question.
+    options must match the ones used for questions, otherwise Ollama reloads
+    the model. Returns the number of prompt tokens Ollama evaluated (the size
+    of the cached prefix), or None if the request failed.
+    """
+    try:
+        response = (session or requests).post(
+            f"{ollama_url}/api/chat",
+            json={
+                "model": ollama_model,
+                "messages": [{"role": "system", "content": system_prompt}],
+                "stream": False,
+                "options": {**options, "num_predict": 1},  # Only the prompt eval matters here
+                "keep_alive": keep_alive,
+            },
+            timeout=120
+        )
+        if response.status_code != 200:
+            return None
+        return response.json().get('prompt_eval_count', 0)
+    except requests.exceptions.RequestException as e:
+        print(f"Warning: could not pre-load documents into Ollama: {e}")
+        return None
+
+
+def record_turn_stats(stats, final_chunk, ttft_seconds):
+    """
+    Add one answer's Ollama metrics to the session stats and return a summary line.
+    Ollama's prompt_eval_count only counts prompt tokens it had to evaluate:
+    normally the new question message (plus the history after its oldest pair
+    is dropped). If it also covers the system prompt's tokens, reported once
+    at pre-load, the cached prefix was not reused.
+    """
+    evaluated = final_chunk.get('prompt_eval_count', 0)
+    eval_ms = final_chunk.get('prompt_eval_duration', 0) / 1e6
+    
+    stats['evaluated_tokens'] += evaluated
+    stats['turns'] += 1
     
-    return system_prompt
+    ms_per_token = eval_ms / evaluated if evaluated else 0.0
+    return (
+        f"[prompt: {evaluated} tokens evaluated in {eval_ms:.0f} ms ({ms_per_token:.1f} ms/token) | "
+        f"ttft {ttft_seconds * 1000:.0f} ms]"
+    )
 
 
-def interactive_qa_loop(documents, ollama_url="http://localhost:11434"):
+def interactive_qa_loop(documents, ollama_url="http://localhost:11434", keep_alive="30m", top_k=5,
+                        history_turns=2):
     """
     Interactive loop where user asks questions and Ollama answers.
+    Each question is answered from the top_k most relevant chunks only, with
+    the last history_turns question/answer pairs sent as conversation history.
+    keep_alive tells Ollama how long to keep the model (and its cached
+    system prompt) loaded between questions.
     """
     if not documents:
         print("No documents loaded. Exiting.")
         return
     
+    # One session for every request, so the connection to Ollama is reused
+    # (HTTP keep-alive) instead of reconnecting for each question
+    session = requests.Session()
+    
     # Check if Ollama is running
     try:
-        response = requests.get(f'{ollama_url}/api/tags', timeout=2)
+        response = session.get(f'{ollama_url}/api/tags', timeout=2)
         if response.status_code != 200:
             print("Error: Could not connect to Ollama.")
             print("Please ensure Ollama is running: ollama serve")
@@ -181,7 +620,36 @@ def interactive_qa_loop(documents, ollama_url="http://localhost:11434"):
         print("Please start Ollama with: ollama serve")
         return
     
-    system_prompt = build_system_prompt(documents)
+    print("Building search index...", end=" ", flush=True)
+    index = build_rag_index(documents)
+    max_chunk_len = max((len(chunk) for chunk, _ in index['chunks']), default=0)
+    print(f"✓ ({len(index['chunks'])} chunks)")
+    
+    # The system message must stay byte-for-byte identical across questions:
+    # any change invalidates Ollama's cached prefix (see build_chat_messages).
+    system_prompt = build_system_prompt()
+    question_chars = top_k * (max_chunk_len + 100) + 500  # top_k of the largest chunks + question
+    options = {
+        "temperature": 0.7,
+        # Room for the instructions, the current question with its excerpts
+        # and the kept history (bare questions of ~500 and answers of ~4000 chars)
+        "num_ctx": estimate_num_ctx(
+            len(system_prompt) + question_chars + history_turns * 4500
+        ),
+    }
+    
+    # Previous questions (without their excerpts) and answers; only whole
+    # user/assistant pairs are dropped once the limit is reached.
+    history = deque(maxlen=2 * history_turns)
+    stats = {'evaluated_tokens': 0, 'turns': 0}
+    
+    # Load the model and process the system prompt once up front
+    print("Pre-loading model into Ollama...", end=" ", flush=True)
+    prefix_tokens = warm_prompt_cache(ollama_url, ollama_model, system_prompt, options, keep_alive, session)
+    if prefix_tokens is not None:
+        print(f"✓ (system prompt: {prefix_tokens} tokens evaluated)")
+    else:
+        print("(skipped)")
     
     print("=" * 60)
     print("Document Q&A System Ready")
@@ -193,6 +661,9 @@ def interactive_qa_loop(documents, ollama_url="http://localhost:11434"):
         user_question = input("Ask a question about the documents: ").strip()
         
         if user_question.lower() in ('exit', 'quit'):
+            if stats['turns']:
+                print(f"Session: {stats['evaluated_tokens']} prompt tokens evaluated "
+                      f"over {stats['turns']} answer(s)")
             print("Goodbye!")
             break
         
@@ -203,27 +674,66 @@ def interactive_qa_loop(documents, ollama_url="http://localhost:11434"):
         print("\nThinking...", end=" ", flush=True)
         
         try:
-            full_prompt = f"{system_prompt}\n\nUser Question: {user_question}"
+            relevant_chunks = retrieve_relevant_chunks(index, user_question, top_k)
+            if not relevant_chunks:
+                print("\n")
+                print("Answer:\nNo relevant information found in documents.\n")
+                continue
             
-            # Call the Ollama API
-            response = requests.post(
-                f"{ollama_url}/api/generate",
+            messages = build_chat_messages(
+                system_prompt, history, build_question_prompt(user_question, relevant_chunks)
+            )
+            
+            # Call the Ollama chat API (stable system message = reusable KV prefix)
+            # and print tokens as they arrive instead of waiting for the full answer
+            request_start = time.perf_counter()
+            ttft = None
+            final_chunk = {}
+            with session.post(
+                f"{ollama_url}/api/chat",
                 json={
                     "model": ollama_model,
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "temperature": 0.7,
+                    "messages": messages,
+                    "stream": True,
+                    "options": options,
+                    "keep_alive": keep_alive,  # Keep model + cached prefix resident between questions
                 },
-                timeout=120  # Give Ollama up to 2 minutes to respond
-            )
-            
-            if response.status_code == 200:
-                answer = response.json().get('response', 'No response received')
-            else:
-                answer = f"Error: Ollama returned status {response.status_code}"
+                stream=True,
+                timeout=120  # Give Ollama up to 2 minutes to start (and between tokens)
+            ) as response:
+                print("\n")
+                print("Answer:")
+                if response.status_code != 200:
+                    print(f"Error: Ollama returned status {response.status_code}\n")
+                    continue
+                
+                answer_parts = []
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get('message', {}).get('content', '')
+                    if token:
+                        if ttft is None:
+                            ttft = time.perf_counter() - request_start
+                        answer_parts.append(token)
+                        print(token, end="", flush=True)
+                    if chunk.get('done'):
+                        final_chunk = chunk
+                        break
+                
+                if not answer_parts:
+                    print("No response received", end="")
+                elif history_turns > 0:
+                    history.append({"role": "user", "content": user_question})
+                    history.append({"role": "assistant", "content": "".join(answer_parts)})
             
+            sources = sorted({Path(meta['file']).name for _, meta in relevant_chunks})
             print("\n")
-            print(f"Answer:\n{answer}\n")
+            print(f"Sources: {', '.join(sources)}")
+            if final_chunk:
+                print(record_turn_stats(stats, final_chunk, ttft or 0.0))
+            print()
         
         except requests.exceptions.Timeout:
             print("\nError: Ollama took too long to respond (timeout after 2 minutes)")
@@ -18,33 +18,85 @@ Requirements:
 2. A model pulled locally: ollama pull mistral (or llama2, neural-chat, etc.)
 3. Ollama running: ollama serve
 
-Requires: requests, PyPDF2, python-docx, scikit-learn
-Install: pip install requests PyPDF2 python-docx scikit-learn
+Requires: requests, pypdf (or PyPDF2), python-docx, scikit-learn
+Install: pip install requests pypdf python-docx scikit-learn
+Optional: pip install pypdfium2 (much faster PDF text extraction)
 """
 
 import os
+import io
 import sys
 import json
+import hashlib
+import functools
+import traceback
+import multiprocessing
+import socket
 from pathlib import Path
 from typing import Dict, List, Tuple
+import queue
 import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import requests
 import time
 
 try:
     import tkinter as tk
     from tkinter import ttk, filedialog, scrolledtext, messagebox
-    from PyPDF2 import PdfReader
+    try:
+        # pypdf is the maintained successor of PyPDF2, with much faster text extraction
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
     from docx import Document as DocxDocument
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
+    from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
+    from sklearn.pipeline import make_pipeline
+    from scipy import sparse
     import numpy as np
+    import joblib  # Installed with scikit-learn
 except ImportError as e:
     print(f"Import error: {e}")
     print("Please install required packages:")
-    print("  pip install requests PyPDF2 python-docx scikit-learn")
+    print("  pip install requests pypdf python-docx scikit-learn")
     sys.exit(1)
 
+try:
+    # Optional: C-backed PDF text extraction, much faster than pypdf/PyPDF2
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# pdfium is not thread-safe: only one thread may use it at a time per process
+PDFIUM_LOCK = threading.Lock()
+
+try:
+    # Optional: approximate nearest-neighbour search for very large collections
+    import faiss
+except ImportError:
+    faiss = None
+
+
+# Fitted indexes are cached here, one file per folder
+INDEX_CACHE_DIR = Path.home() / ".cache" / "folderqa"
+# Bump when chunking or the cache layout changes so stale entries are not reused
+INDEX_CACHE_VERSION = 8
+
+# Ollama embedding models used for dense search when one is pulled, in order
+# of preference. They cannot answer questions, so they are never the chat model.
+EMBEDDING_MODELS = ('nomic-embed-text', 'mxbai-embed-large', 'bge-m3', 'snowflake-arctic-embed', 'all-minilm')
+
+# Static instructions, built once and sent as the system message of every
+# question so Ollama can reuse its evaluated prefix. Only the retrieved
+# excerpts and the question (the user message) change per question.
+SYSTEM_PROMPT = """Answer based ONLY on the document excerpts provided with each question. Be concise but informative.
+
+Instructions:
+- Answer directly without lengthy preambles
+- Include source document names in parentheses: (from DocumentName)
+- Use bullet points for lists
+- If information is not in documents, state "Not in provided documents"
+- Keep answer focused and clear"""
+
 
 class DocumentQAGUI:
     def __init__(self, root):
@@ -52,38 +104,98 @@ class DocumentQAGUI:
         self.root.title("DocumentQA - Interactive Document Q&A (Local Ollama)")
         self.root.geometry("1000x700")
         
-        self.documents = {}  # {file_path: text}
+        self.documents = {}  # {file_path: chunk_count}
         self.document_chunks = {}  # {doc_id: [(chunk_text, start_idx, end_idx), ...]}
         self.vectorizer = None
-        self.tfidf_matrix = None
+        self.tfidf_csc = None  # TF-IDF vectors, column-major so a query only touches its own terms
+        self.embed_model = None  # Ollama embedding model, if one is pulled
+        self.embeddings = None  # L2-normalized chunk embeddings (float32), one row per chunk
+        self.dense_index = None  # FAISS inner-product index over self.embeddings
+        self.ann_min_chunks = 10000  # Below this, exact search is fast enough
+        self.hashing_min_chunks = 50000  # From here on, hash terms instead of building a vocabulary
+        self.min_chunk_similarity = 0.01  # Chunks scoring at or below this are never retrieved
+        # Default "Min. match" for each search mode. Embeddings of unrelated text
+        # typically still score 0.3-0.45, far above what TF-IDF gives them.
+        self.min_similarity_defaults = {'tfidf': 0.1, 'dense': 0.5}
         self.all_chunks = []  # flat list of chunks for searching
-        self.chunk_to_doc = {}  # {chunk_idx: doc_name}
+        self.doc_names = []  # short name of each loaded document
+        self.chunk_doc_ids = np.empty(0, dtype=np.int32)  # index into doc_names for each chunk
+        # Repeated (or re-asked) questions skip vectorizing and scoring; cleared on reload
+        self._ranked_chunks = functools.lru_cache(maxsize=256)(self._rank_chunks)
         self.ollama_model = None  # Will be set when Ollama is detected
         self.ollama_url = "http://localhost:11434"  # Ollama local server URL
+        self.ollama_keep_alive = "30m"  # Keep model loaded between questions (Ollama default is 5m)
+        self.session = requests.Session()  # Reuses the connection to Ollama (HTTP keep-alive)
         
         self.client = None
         
+        # Tk is not thread-safe: worker threads queue their widget updates here
+        # and the Tk thread runs them
+        self._ui_queue = queue.Queue()
+        
+        # Loads and questions run on one long-lived pool instead of a new thread
+        # per click; at most one of each is in flight at a time
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._load_future = None
+        self._question_future = None
+        self._stop_generation = threading.Event()  # Set by the Stop button to end streaming early
+        self._answer_response = None  # Ollama response being streamed, so Stop can cut it off
+        
         self._setup_ui()
         self._check_api_key()
+        self.root.after(50, self._drain_ui_queue)
+    
+    def _post_ui(self, func, *args):
+        """Schedule func(*args) to run on the Tk thread (safe to call from any thread)."""
+        self._ui_queue.put((func, args))
+    
+    def _drain_ui_queue(self):
+        """Run the widget updates queued by worker threads, then check again in 50 ms."""
+        # Consecutive appends (e.g. streamed answer tokens) become a single insert
+        pending_text = []
+        try:
+            while True:
+                func, args = self._ui_queue.get_nowait()
+                if func == self._append_output:
+                    pending_text.append(args[0])
+                    continue
+                if pending_text:
+                    self._append_output(''.join(pending_text))
+                    pending_text = []
+                func(*args)
+        except queue.Empty:
+            pass
+        finally:
+            # A failing update must not stop the queue (and leave the buttons disabled)
+            try:
+                if pending_text:
+                    self._append_output(''.join(pending_text))
+            finally:
+                self.root.after(50, self._drain_ui_queue)
     
     def _check_api_key(self):
         """Check if Ollama is running and accessible."""
         try:
             # Test connection to Ollama
-            response = requests.get('http://localhost:11434/api/tags', timeout=2)
+            response = self.session.get(f"{self.ollama_url}/api/tags", timeout=2)
             if response.status_code == 200:
                 models = response.json().get('models', [])
-                if models:
+                model_names = [m['name'] for m in models]
+                embed_names = [name for name in model_names if name.split(':')[0] in EMBEDDING_MODELS]
+                chat_names = [name for name in model_names if name not in embed_names]
+                if chat_names:
                     # Prefer openchat, then mistral, then use first available
-                    model_names = [m['name'] for m in models]
-                    if 'openchat' in model_names:
+                    if 'openchat' in chat_names:
                         self.ollama_model = 'openchat'
-                    elif 'mistral' in model_names:
+                    elif 'mistral' in chat_names:
                         self.ollama_model = 'mistral'
                     else:
-                        self.ollama_model = model_names[0]
+                        self.ollama_model = chat_names[0]
+                    if embed_names:
+                        self.embed_model = min(embed_names, key=lambda name: EMBEDDING_MODELS.index(name.split(':')[0]))
                     self.client = True  # Client is "initialized" (Ollama is running)
-                    self.status_var.set(f"✓ Ollama connected - Using model: {self.ollama_model}")
+                    search = f", search: {self.embed_model}" if self.embed_model else ""
+                    self.status_var.set(f"✓ Ollama connected - Using model: {self.ollama_model}{search}")
                     return
             messagebox.showwarning(
                 "Ollama Not Ready",
@@ -137,8 +249,18 @@ class DocumentQAGUI:
         
         self.ask_button = ttk.Button(button_frame, text="Ask", command=self._ask_question_async)
         self.ask_button.pack(side=tk.LEFT, padx=2)
+        self.stop_button = ttk.Button(button_frame, text="Stop", command=self._stop_answer, state='disabled')
+        self.stop_button.pack(side=tk.LEFT, padx=2)
         ttk.Button(button_frame, text="Clear", command=self._clear_output).pack(side=tk.LEFT, padx=2)
         
+        # Below this best-match similarity the LLM is not called at all
+        ttk.Label(button_frame, text="Min. match:").pack(side=tk.LEFT, padx=(10, 2))
+        self.min_similarity_var = tk.DoubleVar(value=self.min_similarity_defaults['tfidf'])
+        ttk.Spinbox(
+            button_frame, from_=0.0, to=1.0, increment=0.05, width=5,
+            textvariable=self.min_similarity_var
+        ).pack(side=tk.LEFT)
+        
         # Lower frame: Answer display
         lower_frame = ttk.LabelFrame(self.root, text="Answer & Retrieved Context", padding=10)
         lower_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -163,174 +285,670 @@ class DocumentQAGUI:
     
     def _load_documents_async(self):
         """Load documents in a separate thread to avoid freezing UI."""
-        thread = threading.Thread(target=self._load_documents, daemon=True)
-        thread.start()
-    
-    def _load_documents(self):
-        """Load all documents from the folder and build RAG index."""
-        folder_path = self.folder_var.get()
-        self.status_var.set("Loading documents...")
-        self.root.update()
-        
-        self.documents = {}
-        self.all_chunks = []
-        self.chunk_to_doc = {}
+        if self._load_future is not None and not self._load_future.done():
+            return  # Already loading
         
-        supported_extensions = {'.pdf', '.txt', '.docx'}
-        folder_path = Path(folder_path)
+        if self._question_future is not None and not self._question_future.done():
+            # Loading rebuilds the index in place, which the question is still reading
+            messagebox.showinfo("Busy", "Please wait for the current answer to finish (or press Stop) before reloading.")
+            return
         
+        folder_path = Path(self.folder_var.get())
         if not folder_path.exists():
             self.status_var.set(f"Folder not found: {folder_path}")
             messagebox.showerror("Error", f"Folder not found: {folder_path}")
             return
         
-        # Extract text from all documents
-        for file_path in folder_path.rglob('*'):
-            if file_path.is_file():
-                ext = file_path.suffix.lower()
-                if ext not in supported_extensions:
-                    continue
-                
-                text = None
-                if ext == '.pdf':
-                    text = self._extract_text_from_pdf(file_path)
-                elif ext == '.docx':
-                    text = self._extract_text_from_docx(file_path)
-                elif ext == '.txt':
-                    text = self._extract_text_from_txt(file_path)
-                
-                if text:
-                    self.documents[str(file_path)] = text
-        
-        # Build RAG index from chunks
-        self._build_rag_index()
+        self.status_var.set("Loading documents...")
+        self._load_future = self._executor.submit(self._load_documents, folder_path)
+        self._load_future.add_done_callback(self._load_finished)
+    
+    def _load_finished(self, future):
+        """Report a load that failed with an exception (runs on the worker thread)."""
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        traceback.print_exception(type(error), error, error.__traceback__)
+        # The index may be half rebuilt, so questions are refused until a load succeeds
+        self.documents = {}
+        self._ranked_chunks.cache_clear()
+        self._post_ui(self.status_var.set, f"Error loading documents: {str(error)[:80]}")
+        self._post_ui(self.info_var.set, "❌ Error - Documents not loaded")
+    
+    def _load_documents(self, folder_path):
+        """Load all documents from the folder and build RAG index (runs on a worker thread)."""
+        self.documents = {}
+        self.all_chunks = []
+        self.doc_names = []
+        
+        supported_extensions = {'.pdf', '.txt', '.docx'}
+        
+        # Extract and chunk all documents in parallel (files are independent)
+        file_paths = [
+            file_path for file_path in folder_path.rglob('*')
+            if file_path.is_file() and file_path.suffix.lower() in supported_extensions
+        ]
+        
+        # Files are identified by content hash. (path, mtime, size) is checked
+        # first so that files untouched since the last run are not even read.
+        file_paths, manifest = self._file_manifest(file_paths)
+        cache_path = self._index_cache_path(folder_path)
+        cached = self._load_index_cache(cache_path)
+        known_hashes = dict(zip(cached['manifest'], cached['hashes'])) if cached is not None else {}
+        cached_chunks = cached['chunks_by_hash'] if cached is not None else {}
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            # Files that were touched, renamed or copied are recognised by content
+            hashes = [known_hashes.get(entry) for entry in manifest]
+            to_hash = [i for i, digest in enumerate(hashes) if digest is None]
+            if to_hash:
+                self._post_ui(self.status_var.set, f"Checking {len(to_hash)} new or modified file(s)...")
+            for i, digest in zip(to_hash, executor.map(self._file_digest, [file_paths[i] for i in to_hash])):
+                hashes[i] = digest
+            if None in hashes:
+                # Skip files that could not be read (e.g. removed since the scan)
+                readable = [i for i, digest in enumerate(hashes) if digest is not None]
+                file_paths = [file_paths[i] for i in readable]
+                manifest = [manifest[i] for i in readable]
+                hashes = [hashes[i] for i in readable]
+            
+            # Only extract content that has not been seen before (and identical files once)
+            chunks_by_hash = {digest: cached_chunks[digest] for digest in hashes if digest in cached_chunks}
+            to_extract = {digest: file_path for digest, file_path in zip(hashes, file_paths) if digest not in chunks_by_hash}
+            
+            # PDF text extraction is CPU-bound Python (and pdfium is not thread-safe),
+            # so with several PDFs they are parsed in separate processes. They are
+            # spawned, not forked: forking this multi-threaded Tk process from a
+            # worker thread can deadlock the child.
+            pdf_count = sum(1 for file_path in to_extract.values() if file_path.suffix.lower() == '.pdf')
+            process_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn')
+            ) if pdf_count > 1 else None
+            try:
+                futures = {}
+                for digest, file_path in to_extract.items():
+                    pool = process_pool if process_pool is not None and file_path.suffix.lower() == '.pdf' else executor
+                    futures[pool.submit(DocumentQAGUI._chunk_document, file_path)] = digest
+                for done, future in enumerate(as_completed(futures), 1):
+                    try:
+                        chunks_by_hash[futures[future]] = future.result()  # Extraction errors are handled per file
+                    except Exception as e:  # e.g. a worker process died
+                        print(f"Error extracting {to_extract[futures[future]]}: {e}")
+                        chunks_by_hash[futures[future]] = []
+                    self._post_ui(self.status_var.set, f"Loading documents... {done}/{len(to_extract)}")
+            finally:
+                if process_pool is not None:
+                    process_pool.shutdown()
+        
+        # Keep scan order so the index is the same from run to run
+        chunk_counts = []
+        doc_hashes = []
+        for file_path, digest in zip(file_paths, hashes):
+            chunks = chunks_by_hash[digest]
+            if chunks:
+                self.documents[str(file_path)] = len(chunks)
+                self.doc_names.append(file_path.name)
+                doc_hashes.append(digest)
+                chunk_counts.append(len(chunks))
+                self.all_chunks.extend(chunks)
+        self.chunk_doc_ids = np.repeat(np.arange(len(chunk_counts), dtype=np.int32), chunk_counts)
+        
+        cached_counts = cached['counts_by_hash'] if cached is not None else {}
+        if cached is not None and cached['doc_hashes'] == doc_hashes:
+            # The same documents produced chunks, in the same order: reuse the
+            # fitted TF-IDF index. (Compared on doc_hashes rather than every
+            # scanned file, since a file that failed before may have chunks now.)
+            self.vectorizer = cached['vectorizer']
+            self.tfidf_csc = cached['matrix'].tocsc() if cached['matrix'] is not None else None
+            counts_by_hash = cached_counts
+            save_cache = cached['manifest'] != manifest  # Record new mtimes so they need no hashing next time
+        else:
+            # Build RAG index from chunks
+            self._post_ui(self.status_var.set, f"Indexing {len(self.all_chunks)} chunk(s)...")
+            counts_by_hash = self._build_rag_index(doc_hashes, chunks_by_hash, cached_counts)
+            save_cache = True
+        
+        # Embeddings are cached per document, so only new content is embedded
+        # (and a trained int8 IVF index is reused while the documents are the same)
+        cached_embeddings = {}
+        cached_ivf = None
+        if cached is not None and cached['embed_model'] == self.embed_model:
+            cached_embeddings = cached['embeddings_by_hash']
+            if cached['ivf'] is not None and cached['ivf']['doc_hashes'] == doc_hashes:
+                cached_ivf = cached['ivf']['data']
+        embeddings_by_hash, ivf_data = self._build_dense_index(
+            doc_hashes, chunks_by_hash, cached_embeddings, cached_ivf
+        )
+        save_cache = (save_cache or embeddings_by_hash.keys() != cached_embeddings.keys()
+                      or ivf_data is not cached_ivf)
+        
+        if save_cache:
+            self._save_index_cache(cache_path, {
+                'version': INDEX_CACHE_VERSION,
+                'manifest': manifest,
+                'hashes': hashes,
+                'doc_hashes': doc_hashes,  # Documents the TF-IDF matrix rows were built from
+                # Failed or empty extractions are retried on the next load
+                'chunks_by_hash': {digest: chunks for digest, chunks in chunks_by_hash.items() if chunks},
+                'vectorizer': self.vectorizer,
+                'matrix': self.tfidf_csc,
+                'counts_by_hash': counts_by_hash,
+                'embed_model': self.embed_model,
+                'embeddings_by_hash': embeddings_by_hash,
+                'ivf': {'doc_hashes': doc_hashes, 'data': ivf_data} if ivf_data is not None else None,
+            })
+        
+        # Cached rankings refer to the previous index
+        self._ranked_chunks.cache_clear()
+        
+        dense = self.dense_index is not None or self.embeddings is not None
+        self._post_ui(self._use_min_similarity_default, 'dense' if dense else 'tfidf')
         
         doc_count = len(self.documents)
         chunk_count = len(self.all_chunks)
-        self.status_var.set(f"✓ Loaded {doc_count} document(s), {chunk_count} chunk(s)")
-        self.info_var.set(f"Ready. {doc_count} documents indexed with RAG.")
+        # Queued after the progress updates above so it is not overwritten by them
+        self._post_ui(self.status_var.set, f"✓ Loaded {doc_count} document(s), {chunk_count} chunk(s)")
+        self._post_ui(self.info_var.set, f"Ready. {doc_count} documents indexed with RAG.")
         
         # Display loaded document names
-        self.output_text.insert(tk.END, f"Loaded {doc_count} documents with {chunk_count} searchable chunks.\n\n")
+        parts = [f"Loaded {doc_count} documents with {chunk_count} searchable chunks.\n\n"]
         if doc_count > 0:
-            self.output_text.insert(tk.END, "Documents loaded:\n")
+            parts.append("Documents loaded:\n")
             for idx, doc_path in enumerate(sorted(self.documents.keys()), 1):
                 doc_name = Path(doc_path).name
-                self.output_text.insert(tk.END, f"  {idx}. {doc_name}\n")
-            self.output_text.insert(tk.END, "\n")
+                parts.append(f"  {idx}. {doc_name}\n")
+            parts.append("\n")
+        self._post_ui(self._append_output, ''.join(parts))
     
-    def _extract_text_from_pdf(self, file_path):
-        """Extract text from PDF."""
+    def _use_min_similarity_default(self, mode):
+        """
+        Switch "Min. match" to the default of the search mode ('tfidf' or
+        'dense') so the floor suits its scores, unless the user changed it.
+        """
+        try:
+            current = float(self.min_similarity_var.get())
+        except (tk.TclError, ValueError):
+            return
+        if current in self.min_similarity_defaults.values():
+            self.min_similarity_var.set(self.min_similarity_defaults[mode])
+    
+    def _file_manifest(self, file_paths):
+        """
+        Return (file_paths, [(path, mtime_ns, size), ...]) in scan order, used to
+        skip hashing unchanged files. Files that cannot be stat'ed are left out.
+        """
+        kept = []
+        manifest = []
+        for file_path in file_paths:
+            try:
+                stat = file_path.stat()
+            except OSError as e:
+                print(f"Error reading {file_path}: {e}")
+                continue
+            kept.append(file_path)
+            manifest.append((str(file_path), stat.st_mtime_ns, stat.st_size))
+        return kept, manifest
+    
+    def _file_digest(self, file_path, block_size=1 << 20):
+        """Return a hex content hash of a file, read in blocks (None if it cannot be read)."""
+        digest = hashlib.blake2b(digest_size=16)
         try:
-            text = []
             with open(file_path, 'rb') as f:
-                reader = PdfReader(f)
-                for page_num, page in enumerate(reader.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        text.append(page_text)
-            return "\n\n".join(text)
+                while True:
+                    block = f.read(block_size)
+                    if not block:
+                        break
+                    digest.update(block)
+        except OSError as e:
+            print(f"Error reading {file_path}: {e}")
+            return None
+        return digest.hexdigest()
+    
+    def _index_cache_path(self, folder_path):
+        """Return the index cache file for a folder."""
+        folder_hash = hashlib.sha1(str(folder_path.resolve()).encode('utf-8')).hexdigest()[:16]
+        return INDEX_CACHE_DIR / f"gui_index_{folder_hash}.joblib"
+    
+    def _load_index_cache(self, cache_path):
+        """Load a cached index, or return None if there is none or it cannot be read."""
+        if not cache_path.exists():
+            return None
+        try:
+            cached = joblib.load(cache_path)
         except Exception as e:
-            print(f"Error extracting PDF {file_path}: {e}")
-            return ""
+            print(f"Ignoring unreadable index cache {cache_path}: {e}")
+            return None
+        return cached if cached.get('version') == INDEX_CACHE_VERSION else None
     
-    def _extract_text_from_docx(self, file_path):
-        """Extract text from DOCX."""
+    def _save_index_cache(self, cache_path, data):
+        """Save the index so an unchanged folder loads without re-extracting on the next run."""
         try:
-            doc = DocxDocument(file_path)
-            paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-            return "\n".join(paragraphs)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so an interrupted save never leaves a corrupt cache
+            tmp_path = cache_path.with_suffix('.tmp')
+            joblib.dump(data, tmp_path)
+            os.replace(tmp_path, cache_path)
         except Exception as e:
-            print(f"Error extracting DOCX {file_path}: {e}")
-            return ""
+            print(f"Could not save index cache: {e}")
     
-    def _extract_text_from_txt(self, file_path):
-        """Extract text from TXT."""
+    @staticmethod
+    def _chunk_document(file_path):
+        """
+        Extract and chunk one document. Extracted text is streamed straight into
+        the chunker, so the full text of the document is never held in memory.
+        Returns the list of chunks ([] if extraction failed or found no text).
+        Static (no GUI state) so it can also run in a worker process.
+        """
+        readers = {
+            '.pdf': DocumentQAGUI._iter_text_from_pdf,
+            '.docx': DocumentQAGUI._iter_text_from_docx,
+            '.txt': DocumentQAGUI._iter_text_from_txt,
+        }
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.read()
+            return list(DocumentQAGUI._chunk_stream(readers[file_path.suffix.lower()](file_path)))
         except Exception as e:
-            print(f"Error reading TXT {file_path}: {e}")
-            return ""
+            print(f"Error extracting {file_path}: {e}")
+            return []
     
-    def _build_rag_index(self):
+    @staticmethod
+    def _chunk_stream(pieces, chunk_size=1000, overlap=200):
         """
-        Build a searchable index by chunking documents and computing embeddings.
-        Uses TF-IDF vectorization for semantic search.
+        Split a stream of text pieces into chunks of at most chunk_size
+        characters that overlap by about overlap characters. Chunks end and
+        start on whitespace where possible so words are not cut in half.
+        Only the unconsumed tail of the text is kept in the buffer.
         """
-        self.all_chunks = []
-        self.chunk_to_doc = {}
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            pos = 0
+            while len(buffer) - pos > chunk_size:
+                chunk, pos = DocumentQAGUI._next_chunk(buffer, pos, chunk_size, overlap)
+                if not chunk.isspace():  # Skip blank chunks without building a stripped copy
+                    yield chunk
+            buffer = buffer[pos:]
         
-        chunk_size = 1000  # Increased from 500 to capture more context per chunk
-        overlap = 200  # Increased from 50 for better continuity between chunks
+        pos = 0
+        while len(buffer) - pos > chunk_size:
+            chunk, pos = DocumentQAGUI._next_chunk(buffer, pos, chunk_size, overlap)
+            if not chunk.isspace():
+                yield chunk
+        if pos < len(buffer) and not buffer[pos:].isspace():
+            yield buffer[pos:]
+    
+    @staticmethod
+    def _next_chunk(buffer, pos, chunk_size, overlap):
+        """
+        Cut one chunk starting at pos from a buffer holding at least chunk_size
+        characters after pos. Returns (chunk, start of the next chunk).
+        """
+        end = pos + chunk_size
+        # End at the last word boundary in the second half of the window
+        cut = max(buffer.rfind(' ', pos + chunk_size // 2, end), buffer.rfind('\n', pos + chunk_size // 2, end))
+        if cut > pos:
+            end = cut
         
-        for doc_name, doc_text in self.documents.items():
-            doc_short_name = Path(doc_name).name
-            
-            # Split into chunks
-            chunks = []
-            for i in range(0, len(doc_text), chunk_size - overlap):
-                chunk = doc_text[i:i + chunk_size]
-                if chunk.strip():
-                    chunks.append(chunk)
-            
-            # Add to global list
-            for chunk in chunks:
-                chunk_idx = len(self.all_chunks)
-                self.all_chunks.append(chunk)
-                self.chunk_to_doc[chunk_idx] = doc_short_name
+        # Start the next chunk at the first word boundary inside the overlap
+        next_pos = end - overlap
+        boundary = min((i for i in (buffer.find(' ', next_pos, end), buffer.find('\n', next_pos, end)) if i >= 0),
+                       default=-1)
+        if boundary >= 0:
+            next_pos = boundary + 1
+        return buffer[pos:end], next_pos
+    
+    @staticmethod
+    def _iter_text_from_pdf(file_path):
+        """Yield PDF text page by page (pages separated by a blank line)."""
+        if pdfium is not None:
+            yield from DocumentQAGUI._iter_text_from_pdf_pdfium(file_path)
+            return
         
+        # One read into memory; the parser seeks and makes many small reads,
+        # which are much cheaper on a BytesIO than on the file
+        reader = PdfReader(io.BytesIO(file_path.read_bytes()))
+        separator = ""
+        for page in reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                yield separator + page_text
+                separator = "\n\n"
+    
+    @staticmethod
+    def _iter_text_from_pdf_pdfium(file_path):
+        """
+        Yield PDF text page by page with pypdfium2, same format as the pypdf path.
+        The pdfium lock is held until the document is closed, so a PDF extracted
+        on the thread pool never overlaps with another.
+        """
+        with PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(str(file_path))
+            try:
+                separator = ""
+                for page_num in range(len(pdf)):
+                    page = pdf[page_num]
+                    textpage = page.get_textpage()
+                    page_text = textpage.get_text_range().replace("\r\n", "\n")
+                    textpage.close()
+                    page.close()
+                    if page_text.strip():
+                        yield separator + page_text
+                        separator = "\n\n"
+            finally:
+                pdf.close()
+    
+    @staticmethod
+    def _iter_text_from_docx(file_path):
+        """Yield DOCX text paragraph by paragraph, skipping blank paragraphs."""
+        doc = DocxDocument(file_path)
+        separator = ""
+        for para in doc.paragraphs:
+            # para.text rebuilds the string from the XML runs on every access, so read it once
+            text = para.text
+            if text and not text.isspace():
+                yield separator + text
+                separator = "\n"
+    
+    @staticmethod
+    def _iter_text_from_txt(file_path, block_size=1 << 16):
+        """Yield TXT text in fixed-size blocks."""
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+    
+    def _build_rag_index(self, doc_hashes, chunks_by_hash, cached_counts):
+        """
+        Build a searchable index over the chunks collected while loading.
+        Uses TF-IDF vectorization for semantic search.
+        doc_hashes lists the content hash of each loaded document in order.
+        Returns {content_hash: term counts} for the index cache when terms are
+        hashed, so unchanged documents are not re-tokenized next time ({} otherwise).
+        """
+        counts_by_hash = {}
+        # Left unset if the fit fails, so the previous folder's index is never used
+        self.vectorizer = None
+        self.tfidf_csc = None
         # Build TF-IDF vectorizer with optimized settings
-        if self.all_chunks:
+        if len(self.all_chunks) >= self.hashing_min_chunks:
             try:
-                # ngram_range=(1,2) captures both single words and phrases
-                # min_df=1 includes all terms, sublinear_tf helps with term frequency scaling
+                # A vocabulary of every unigram and bigram in a very large folder
+                # takes a lot of memory before max_features prunes it. Hashing
+                # terms into a fixed feature space needs no vocabulary at all, and
+                # because it is stateless each document's counts can be cached.
+                # norm=None: rows are L2-normalized after IDF weighting instead.
+                hasher = HashingVectorizer(
+                    n_features=2 ** 18,
+                    stop_words='english',
+                    ngram_range=(1, 2),
+                    alternate_sign=False,
+                    norm=None,
+                    dtype=np.float32
+                )
+                for digest in dict.fromkeys(doc_hashes):
+                    if digest in cached_counts:
+                        counts_by_hash[digest] = cached_counts[digest]
+                    else:
+                        counts_by_hash[digest] = hasher.transform(chunks_by_hash[digest])
+                counts = sparse.vstack([counts_by_hash[digest] for digest in doc_hashes], format='csr')
+                # Only the IDF weights depend on the whole folder
+                transformer = TfidfTransformer(sublinear_tf=True)
+                self.tfidf_csc = transformer.fit_transform(counts).tocsc()
+                self.vectorizer = make_pipeline(hasher, transformer)
+            except Exception as e:
+                print(f"Error building TF-IDF index: {e}")
+                counts_by_hash = {}
+        elif self.all_chunks:
+            try:
+                # ngram_range=(1,2) captures both single words and phrases,
+                # sublinear_tf helps with term frequency scaling.
+                # Pruning one-off and near-universal terms only makes sense once
+                # there are enough chunks; on tiny folders it would empty the vocabulary.
+                prune = len(self.all_chunks) >= 50
                 self.vectorizer = TfidfVectorizer(
-                    max_features=1000,  # Increased from 500 to capture more vocabulary
+                    max_features=10000,  # Room for the vocabulary of a multi-document folder
                     stop_words='english',
                     ngram_range=(1, 2),  # Include bigrams for better phrase matching
-                    min_df=1,
-                    sublinear_tf=True
+                    min_df=2 if prune else 1,
+                    max_df=0.95 if prune else 1.0,
+                    sublinear_tf=True,
+                    dtype=np.float32  # Half the memory of the float64 default, same ranking
                 )
-                self.tfidf_matrix = self.vectorizer.fit_transform(self.all_chunks)
+                # Rows come back L2-normalized, so cosine similarity is a plain dot product.
+                # A query only has a handful of terms, so summing those few columns
+                # is far cheaper than a row-by-row sparse product over every chunk.
+                self.tfidf_csc = self.vectorizer.fit_transform(self.all_chunks).tocsc()
             except Exception as e:
                 print(f"Error building TF-IDF index: {e}")
+        
+        return counts_by_hash
+    
+    def _build_dense_index(self, doc_hashes, chunks_by_hash, cached_embeddings, cached_ivf=None):
+        """
+        Embed every chunk with the Ollama embedding model and build the dense
+        search index (FAISS inner product if installed, else a numpy matrix;
+        an int8 IVF index for large collections). Vectors of documents already
+        in cached_embeddings are reused.
+        Returns ({content_hash: vectors}, serialized IVF index or None) for the
+        index cache. Without an embedding model search stays TF-IDF only.
+        """
+        self.embeddings = None
+        self.dense_index = None
+        if self.embed_model is None or not self.all_chunks:
+            return {}, None
+        
+        embeddings_by_hash = {digest: cached_embeddings[digest] for digest in doc_hashes if digest in cached_embeddings}
+        missing = [digest for digest in dict.fromkeys(doc_hashes) if digest not in embeddings_by_hash]
+        texts = [chunk for digest in missing for chunk in chunks_by_hash[digest]]
+        if texts:
+            try:
+                vectors = self._embed_texts(texts, progress=lambda done: self._post_ui(
+                    self.status_var.set, f"Embedding chunks with {self.embed_model}... {done}/{len(texts)}"
+                ))
+            except Exception as e:
+                print(f"Error embedding chunks, using TF-IDF search only: {e}")
+                return {}, None
+            start = 0
+            for digest in missing:
+                count = len(chunks_by_hash[digest])
+                embeddings_by_hash[digest] = vectors[start:start + count]
+                start += count
+        
+        embeddings = np.vstack([embeddings_by_hash[digest] for digest in doc_hashes])
+        if faiss is not None and len(embeddings) >= self.ann_min_chunks:
+            try:
+                return embeddings_by_hash, self._build_ivf_index(embeddings, cached_ivf)
+            except Exception as e:
+                print(f"Error building IVF index, using exact search: {e}")
+        
+        self.embeddings = embeddings
+        if faiss is not None:
+            self.dense_index = faiss.IndexFlatIP(embeddings.shape[1])
+            self.dense_index.add(embeddings)
+        return embeddings_by_hash, None
+    
+    def _build_ivf_index(self, embeddings, serialized=None):
+        """
+        Build a FAISS IVF index with int8 scalar-quantized vectors for a large
+        collection: vectors take a quarter of their float32 size and a query
+        scans only the nprobe nearest of ~sqrt(N) clusters. Training is skipped
+        when a serialized index for the same documents is passed in.
+        Returns the serialized index for the cache.
+        """
+        if serialized is None:
+            d = embeddings.shape[1]
+            nlist = max(4, int(np.sqrt(len(embeddings))))
+            quantizer = faiss.IndexFlatIP(d)
+            # Product quantization (IndexIVFPQ) is smaller still, but lost ~40-60% of
+            # top-5 recall on sentence-embedding-like data; int8 keeps ~98%
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, d, nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(embeddings)
+            index.add(embeddings)
+            serialized = faiss.serialize_index(index)
+        else:
+            index = faiss.deserialize_index(serialized)
+        index.nprobe = 8
+        self.dense_index = index
+        return serialized
+    
+    def _embed_texts(self, texts, batch_size=64, progress=None):
+        """
+        Embed texts with the Ollama embedding model; returns L2-normalized float32 rows.
+        progress, if given, is called with the number of texts embedded so far.
+        """
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            response = self.session.post(
+                f"{self.ollama_url}/api/embed",
+                json={
+                    "model": self.embed_model,
+                    "input": texts[start:start + batch_size],
+                    "keep_alive": self.ollama_keep_alive,
+                },
+                timeout=120
+            )
+            response.raise_for_status()
+            vectors.extend(response.json()['embeddings'])
+            if progress is not None:
+                progress(len(vectors))
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # Normalized rows make the inner product the cosine similarity
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
     
-    def _retrieve_relevant_chunks(self, query: str, top_k: int = 10) -> List[Tuple[str, str]]:
+    def _retrieve_relevant_chunks(self, query: str, top_k: int = 10) -> Tuple[List[Tuple[str, str]], float]:
         """
         Retrieve the most relevant chunks for a query using TF-IDF similarity.
-        Returns: [(chunk_text, source_doc_name), ...]
+        Returns: ([(chunk_text, source_doc_name), ...], best_similarity)
         """
-        if not self.vectorizer or not self.all_chunks:
-            return []
+        searchable = self.vectorizer is not None or self.dense_index is not None or self.embeddings is not None
+        if not searchable or not self.all_chunks:
+            return [], 0.0
         
         try:
-            query_vec = self.vectorizer.transform([query])
-            similarities = cosine_similarity(query_vec, self.tfidf_matrix)[0]
-            
-            # Get top-k indices, sorted by similarity
-            top_indices = np.argsort(similarities)[::-1][:top_k]
-            
-            results = []
-            min_similarity = 0.01  # Only include chunks with meaningful similarity
-            for idx in top_indices:
-                if similarities[idx] > min_similarity:
-                    chunk = self.all_chunks[idx]
-                    doc_name = self.chunk_to_doc.get(idx, "Unknown")
-                    results.append((chunk, doc_name))
-            
-            return results
+            # The vectorizer lowercases and splits on whitespace anyway, so this
+            # normalization only makes more repeats hit the cache
+            normalized_query = ' '.join(query.lower().split())
+            ranked = self._ranked_chunks(normalized_query, top_k)
+            results = self._compact_chunks([idx for idx, _ in ranked])
+            return results, (ranked[0][1] if ranked else 0.0)
         except Exception as e:
             print(f"Error retrieving chunks: {e}")
-            return []
+            return [], 0.0
+    
+    def _compact_chunks(self, indices, shingle_size=5, max_seen_fraction=0.6):
+        """
+        Turn ranked chunk indices into [(text, doc_name), ...] without sending
+        the same text twice: neighbouring chunks of one document are merged into
+        a single span (dropping their shared overlap), and a span whose word
+        shingles have mostly been seen already is dropped.
+        """
+        selected = set(indices)
+        placed = set()
+        spans = []
+        for idx in indices:  # Best first, so each span keeps its best member's rank
+            if idx in placed:
+                continue
+            doc_id = self.chunk_doc_ids[idx]
+            start = end = idx
+            while start - 1 in selected and start - 1 not in placed and self.chunk_doc_ids[start - 1] == doc_id:
+                start -= 1
+            while end + 1 in selected and end + 1 not in placed and self.chunk_doc_ids[end + 1] == doc_id:
+                end += 1
+            text = self.all_chunks[start]
+            for i in range(start + 1, end + 1):
+                text = self._join_overlapping(text, self.all_chunks[i])
+            placed.update(range(start, end + 1))
+            spans.append((text, self.doc_names[doc_id]))
+        
+        seen = set()
+        results = []
+        for text, doc_name in spans:
+            words = text.split()
+            shingles = {hash(tuple(words[i:i + shingle_size])) for i in range(max(1, len(words) - shingle_size + 1))}
+            if len(shingles & seen) > max_seen_fraction * len(shingles):
+                continue
+            seen |= shingles
+            results.append((text, doc_name))
+        return results
+    
+    def _join_overlapping(self, text, next_chunk):
+        """Append next_chunk to text, dropping the prefix it shares with the end of text."""
+        overlap_start = text.rfind(next_chunk[:50], max(0, len(text) - 300))
+        if overlap_start >= 0 and next_chunk.startswith(text[overlap_start:]):
+            return text + next_chunk[len(text) - overlap_start:]
+        return text + "\n" + next_chunk
+    
+    def _rank_chunks(self, query: str, top_k: int) -> Tuple[Tuple[int, float], ...]:
+        """
+        Return (chunk_index, similarity) for the top_k chunks most similar to
+        the query, best first. Called through the self._ranked_chunks LRU cache.
+        Uses the dense embeddings when available, TF-IDF otherwise.
+        """
+        if self.dense_index is not None or self.embeddings is not None:
+            try:
+                return self._rank_chunks_dense(query, top_k)
+            except Exception as e:
+                print(f"Error embedding query, falling back to TF-IDF: {e}")
+        
+        if self.vectorizer is None:
+            return ()  # The TF-IDF index could not be built
+        
+        min_similarity = self.min_chunk_similarity
+        query_vec = self.vectorizer.transform([query])
+        if query_vec.nnz == 0:
+            return ()  # No indexed term in the query, so nothing can match
+        
+        # Dot product of normalized rows == cosine similarity; only the
+        # query's own term columns contribute
+        similarities = self.tfidf_csc[:, query_vec.indices] @ query_vec.data
+        
+        # Chunks sharing no term with the query score 0, usually most of
+        # them, so only the ones above the threshold are ranked
+        matching = np.flatnonzero(similarities > min_similarity)
+        top_indices = matching[self._top_k_order(similarities[matching], top_k)]
+        top_scores = similarities[top_indices]
+        
+        return tuple((int(idx), float(score)) for idx, score in zip(top_indices, top_scores) if score > min_similarity)
+    
+    def _rank_chunks_dense(self, query: str, top_k: int) -> Tuple[Tuple[int, float], ...]:
+        """Like _rank_chunks, but by cosine similarity of the chunk embeddings."""
+        query_vec = self._embed_texts([query])
+        if self.dense_index is not None:
+            scores, ids = self.dense_index.search(query_vec, top_k)
+            found = ids[0] >= 0
+            top_indices, top_scores = ids[0][found], scores[0][found]
+        else:
+            similarities = self.embeddings @ query_vec[0]
+            top_indices = self._top_k_order(similarities, top_k)
+            top_scores = similarities[top_indices]
+        
+        return tuple((int(idx), float(score)) for idx, score in zip(top_indices, top_scores)
+                     if score > self.min_chunk_similarity)
+    
+    def _top_k_order(self, scores, top_k):
+        """
+        Return the indices of the top_k highest scores, best first. Partitions
+        first so only the k best scores are sorted rather than every entry.
+        """
+        if len(scores) > top_k:
+            top_indices = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            top_indices = np.arange(len(scores))
+        return top_indices[np.argsort(-scores[top_indices])]
     
     def _ask_question_async(self):
         """Ask question in a separate thread."""
-        thread = threading.Thread(target=self._ask_question, daemon=True)
-        thread.start()
-    
-    def _ask_question(self):
-        """Ask a question using RAG."""
+        if self._question_future is not None and not self._question_future.done():
+            return  # Still answering the previous question
+        
+        if self._load_future is not None and not self._load_future.done():
+            # The index is half rebuilt until the load finishes
+            messagebox.showinfo("Loading", "Documents are still loading. Please wait for the load to finish.")
+            return
+        
         if not self.documents:
             messagebox.showwarning("No Documents", "Please load documents first.")
             return
@@ -344,101 +962,215 @@ class DocumentQAGUI:
             messagebox.showwarning("No Question", "Please enter a question.")
             return
         
+        try:
+            min_confidence = float(self.min_similarity_var.get())
+        except (tk.TclError, ValueError):
+            min_confidence = 0.0  # Unparseable spinbox text: never skip the LLM
+        
         # Show visual feedback - disable button and update status
         self.ask_button.config(state='disabled')
         self.question_entry.config(state='disabled')
         self.info_var.set("⏳ Processing... Searching documents and generating answer...")
-        self.root.update()
+        self._stop_generation.clear()
+        self.stop_button.config(state='normal')
         
+        self._question_future = self._executor.submit(self._ask_question, question, min_confidence)
+    
+    def _ask_question(self, question, min_confidence=0.0):
+        """
+        Answer a question using RAG (runs on a worker thread).
+        If the best chunk's similarity is below min_confidence the LLM is not called.
+        """
         try:
             # Retrieve relevant chunks using RAG (reduced to 5 for faster processing)
-            relevant_chunks = self._retrieve_relevant_chunks(question, top_k=5)
+            relevant_chunks, best_similarity = self._retrieve_relevant_chunks(question, top_k=5)
             
             if not relevant_chunks:
-                self.output_text.insert(tk.END, f"Q: {question}\n\n")
-                self.output_text.insert(tk.END, "A: No relevant information found in documents.\n\n")
-                self.info_var.set("✓ Ready")
+                self._post_ui(self._append_output, f"Q: {question}\n\nA: No relevant information found in documents.\n\n")
+                self._post_ui(self.info_var.set, "✓ Ready")
+                return
+            
+            if best_similarity < min_confidence:
+                # Weak matches only: the answer would be a guess, so skip the LLM round-trip
+                self._post_ui(
+                    self._append_output,
+                    f"Q: {question}\n\nA: I don't have enough information in the documents to answer that "
+                    f"(best match {best_similarity:.2f} < {min_confidence:.2f}).\n\n"
+                )
+                self._post_ui(self.info_var.set, "✓ Ready - No confident match, LLM not called")
                 return
             
             # Build context from retrieved chunks (limit to top 5 for faster processing)
+            # Collect the pieces and join once rather than copying the
+            # excerpts into an intermediate context string
             top_chunks = relevant_chunks[:5]
-            context = "\n\n---\n\n".join([
-                f"[From: {doc}]\n{chunk}" for chunk, doc in top_chunks
-            ])
+            user_parts = ["DOCUMENT EXCERPTS:\n"]
+            for i, (chunk, doc) in enumerate(top_chunks):
+                if i:
+                    user_parts.append("\n\n---\n\n")
+                user_parts.extend((f"[From: {doc}]\n", chunk))
+            user_parts.extend(("\n\nQuestion: ", question))
             
-            # Build system prompt with retrieved context - optimized for faster responses
-            system_prompt = f"""Answer based ONLY on the provided documents. Be concise but informative.
-
-DOCUMENT EXCERPTS:
-{context}
-
-Instructions:
-- Answer directly without lengthy preambles
-- Include source document names in parentheses: (from DocumentName)
-- Use bullet points for lists
-- If information is not in documents, state "Not in provided documents"
-- Keep answer focused and clear"""
+            # Only the excerpts and question change per question; SYSTEM_PROMPT is fixed
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": "".join(user_parts)},
+            ]
             
-            # Call Ollama with RAG context
-            full_prompt = f"{system_prompt}\n\nQuestion: {question}"
+            # Show the question and context right away; the answer streams in below it
+            parts = [f"Q: {question}\n\n", "Retrieved Context:\n"]
+            for i, (chunk, doc) in enumerate(relevant_chunks, 1):
+                preview = chunk[:200].replace('\n', ' ')
+                parts.append(f"  {i}. [{doc}] {preview}...\n")
+            parts.append("\nA: ")
+            self._post_ui(self._append_output, ''.join(parts))
             
             # Update status to show we're waiting for LLM
-            self.info_var.set("⌛ Waiting for Ollama LLM to generate response...")
-            self.root.update()
+            self._post_ui(self.info_var.set, "⌛ Waiting for Ollama LLM to generate response...")
             
-            # Call the Ollama API with optimized parameters for faster responses
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
+            # Call the Ollama chat API with optimized parameters for faster responses,
+            # streaming so tokens are shown as soon as they are generated
+            stats = ""
+            stopped = False
+            with self.session.post(
+                f"{self.ollama_url}/api/chat",
                 json={
                     "model": self.ollama_model,
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "temperature": 0.3,  # Lower temp = faster, more predictable responses
-                    "top_p": 0.9,  # Narrow probability distribution for speed
-                    "top_k": 40,   # Reduce token options considered
-                    "num_predict": 500,  # Limit output length to ~500 tokens (speeds up generation)
+                    "messages": messages,
+                    "stream": True,
+                    "options": {
+                        "temperature": 0.3,  # Lower temp = faster, more predictable responses
+                        "top_p": 0.9,  # Narrow probability distribution for speed
+                        "top_k": 40,   # Reduce token options considered
+                        "num_predict": 500,  # Limit output length to ~500 tokens (speeds up generation)
+                    },
+                    "keep_alive": self.ollama_keep_alive,  # Avoid reloading the model on every question
                 },
-                timeout=120  # Give Ollama up to 2 minutes to respond
-            )
+                stream=True,
+                timeout=120  # Give Ollama up to 2 minutes to start (and between tokens)
+            ) as response:
+                self._answer_response = response
+                if response.status_code == 200:
+                    received = False
+                    try:
+                        for line in response.iter_lines():
+                            if self._stop_generation.is_set():
+                                break  # Leaving the with block drops the connection
+                            if not line:
+                                continue
+                            result = json.loads(line)
+                            token = result.get('message', {}).get('content', '')
+                            if token:
+                                if not received:
+                                    self._post_ui(self.info_var.set, "✍ Receiving answer...")
+                                    received = True
+                                self._post_ui(self._append_output, token)
+                            if result.get('done'):
+                                stats = self._format_ollama_stats(result)
+                                break
+                    except Exception:
+                        if not self._stop_generation.is_set():
+                            raise
+                        # Otherwise the read was cut off by _stop_answer
+                    if self._stop_generation.is_set():
+                        stopped = True
+                        self._post_ui(self._append_output, " [stopped]")
+                    elif not received:
+                        self._post_ui(self._append_output, "No response received")
+                else:
+                    self._post_ui(self._append_output, f"Error: Ollama returned status {response.status_code}")
             
-            if response.status_code == 200:
-                answer = response.json().get('response', 'No response received')
+            self._post_ui(self._append_output, "\n\n" + "=" * 80 + "\n\n")
+            self._post_ui(self.question_entry.delete, 0, tk.END)
+            if stopped:
+                self._post_ui(self.info_var.set, "⏹ Stopped - Partial answer shown")
             else:
-                answer = f"Error: Ollama returned status {response.status_code}"
-            
-            # Display in UI
-            self.output_text.insert(tk.END, f"Q: {question}\n\n")
-            self.output_text.insert(tk.END, "Retrieved Context:\n")
-            for i, (chunk, doc) in enumerate(relevant_chunks, 1):
-                preview = chunk[:200].replace('\n', ' ')
-                self.output_text.insert(tk.END, f"  {i}. [{doc}] {preview}...\n")
-            self.output_text.insert(tk.END, "\nA: " + answer + "\n\n")
-            self.output_text.insert(tk.END, "=" * 80 + "\n\n")
-            self.output_text.see(tk.END)
-            self.question_entry.delete(0, tk.END)
-            self.info_var.set("✓ Ready - Answer generated successfully")
+                self._post_ui(self.info_var.set, f"✓ Ready - Answer generated successfully {stats}".rstrip())
         
         except requests.exceptions.Timeout:
-            self.output_text.insert(tk.END, f"Error: Ollama response timeout. Try a smaller model or check system resources.\n\n")
-            self.info_var.set("❌ Error - Response timeout")
+            self._post_ui(self._append_output, "Error: Ollama response timeout. Try a smaller model or check system resources.\n\n")
+            self._post_ui(self.info_var.set, "❌ Error - Response timeout")
         except Exception as e:
-            self.output_text.insert(tk.END, f"API Error: {e}\n\n")
-            self.info_var.set(f"❌ Error - {str(e)[:50]}")
+            self._post_ui(self._append_output, f"API Error: {e}\n\n")
+            self._post_ui(self.info_var.set, f"❌ Error - {str(e)[:50]}")
         
         finally:
+            self._answer_response = None
             # Re-enable button and input field
-            self.ask_button.config(state='normal')
-            self.question_entry.config(state='normal')
+            self._post_ui(functools.partial(self.ask_button.config, state='normal'))
+            self._post_ui(functools.partial(self.question_entry.config, state='normal'))
+            self._post_ui(functools.partial(self.stop_button.config, state='disabled'))
+    
+    def _stop_answer(self):
+        """
+        Stop the streaming answer (Stop button). The socket is shut down so the
+        worker's blocked read returns at once instead of after the next token;
+        dropping the connection also makes Ollama stop generating. Ollama only
+        sends its response once the prompt is evaluated, and a Stop before that
+        takes effect as soon as it arrives.
+        """
+        self._stop_generation.set()
+        self.info_var.set("⏹ Stopping...")
+        response = self._answer_response
+        if response is None:
+            return
+        sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # Already closed
+        response.close()
+    
+    def _format_ollama_stats(self, result):
+        """
+        Summarize Ollama's timing fields for the status bar.
+        prompt_eval_count only counts prompt tokens Ollama had to evaluate, so a
+        value close to the whole prompt on every question means the cached
+        system prompt is not being reused.
+        """
+        if 'prompt_eval_count' not in result:
+            return ""
+        prompt_ms = result.get('prompt_eval_duration', 0) / 1e6
+        eval_count = result.get('eval_count', 0)
+        eval_s = result.get('eval_duration', 0) / 1e9
+        rate = eval_count / eval_s if eval_s else 0.0
+        return (f"[prompt: {result['prompt_eval_count']} tokens evaluated in {prompt_ms:.0f} ms | "
+                f"answer: {eval_count} tokens at {rate:.1f} tok/s]")
+    
+    def _append_output(self, text):
+        """Append text to the output area and scroll to it (call on the Tk thread)."""
+        self.output_text.insert(tk.END, text)
+        self.output_text.see(tk.END)
     
     def _clear_output(self):
         """Clear the output text area."""
         self.output_text.delete(1.0, tk.END)
+    
+    def _shutdown(self):
+        """
+        Stop background work once the window is closed. A load or answer that
+        is still running is abandoned rather than waited for, so closing the
+        window never hangs (the index cache is written atomically, so an
+        interrupted save leaves the previous cache intact).
+        """
+        self._stop_generation.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        running = [future for future in (self._load_future, self._question_future)
+                   if future is not None and not future.done()]
+        if running:
+            # Executor threads are not daemon threads: the interpreter would
+            # join them at exit and wait for the work (up to the 120 s timeout)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(0)
 
 
 def main():
     root = tk.Tk()
     app = DocumentQAGUI(root)
     root.mainloop()
+    app._shutdown()
 
 
 if __name__ == '__main__':